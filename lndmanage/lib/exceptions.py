@@ -56,3 +56,7 @@ class RPCError(Exception):
 
 class RouterRPCError(RPCError):
     pass
+
+
+class PolicyUpdateError(RPCError):
+    pass
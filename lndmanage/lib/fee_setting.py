@@ -1,18 +1,103 @@
-import lndmanage.grpc_compiled.rpc_pb2 as ln
+import numpy as np
 
 import logging
 logger = logging.getLogger(__name__)
 logger.addHandler(logging.NullHandler())
 
 CLTV = 40
+# policy of channels missing in lnd's fee report
+UNKNOWN_FEE_POLICY = {'base_fee_msat': float(-999), 'fee_per_mil': float(999)}
+
+
+class ChannelColumns(object):
+    """
+    Holds the fee relevant data of a set of channels column-wise, such that
+    computations can be carried out on whole arrays instead of per channel.
+
+    The local base fees and fee rates are taken from lnd's fee report, as
+    the policies in the channel dicts stem from a possibly cached graph.
+
+    :param channels: list of channel dicts as given by
+        :func:`lib.node.LndNode.get_open_channels`
+    :param fee_policies: dict as given by
+        :func:`lib.node.LndNode.get_channel_fee_policies`
+    """
+    def __init__(self, channels, fee_policies):
+        self.chan_id = [c['chan_id'] for c in channels]
+        self.channel_point = [c['channel_point'] for c in channels]
+        self.alias = [c['alias'] for c in channels]
+        self.ub = self._column(channels, 'unbalancedness')
+        # policies of unknown channels are set to float error values
+        local_policies = [
+            fee_policies.get(cp, UNKNOWN_FEE_POLICY)
+            for cp in self.channel_point]
+        self.local_base_fee = self._column(local_policies, 'base_fee_msat')
+        # given in parts per million
+        self.local_fee_rate = self._column(local_policies, 'fee_per_mil')
+        self.local_time_lock_delta = self._column(
+            channels, 'local_time_lock_delta')
+
+    @staticmethod
+    def _column(channels, key):
+        return np.fromiter(
+            (c[key] for c in channels), dtype=float, count=len(channels))
+
+    def __len__(self):
+        return len(self.chan_id)
+
+
+def compute_policies_by_balancedness(
+        ub, base_unbalanced_msat, rate_unbalanced_decimal, base_balanced_msat,
+        rate_balanced_decimal, unbalancedness=0.90):
+    """
+    Determines the new fee policies for a set of channels from their
+    unbalancednesses in a single pass over the arrays.
+
+    :param ub: np.array of channel unbalancednesses
+    :param base_unbalanced_msat: int
+    :param rate_unbalanced_decimal: float
+    :param base_balanced_msat: int
+    :param rate_balanced_decimal: float
+    :param unbalancedness: float between 0 ... 1
+    :return: np.arrays: is_unbalanced, new base fees, new fee rates
+    """
+    is_unbalanced = np.abs(ub) > unbalancedness
+    new_bases = np.where(
+        is_unbalanced, base_unbalanced_msat, base_balanced_msat)
+    new_rates = np.where(
+        is_unbalanced, rate_unbalanced_decimal, rate_balanced_decimal)
+    return is_unbalanced, new_bases, new_rates
+
+
+def unchanged_policies(local_base_fee, local_fee_rate, local_time_lock_delta,
+                       new_bases, new_rates, cltv):
+    """
+    Determines which channels already have their new fee policy.
+
+    Fee rates are compared in lnd's integer parts per million, to which lnd
+    truncates the decimal fee rate when setting a policy.
+
+    :param local_base_fee: np.array of current base fees in msat
+    :param local_fee_rate: np.array of current fee rates in ppm
+    :param local_time_lock_delta: np.array of current time lock deltas
+    :param new_bases: np.array of new base fees in msat
+    :param new_rates: np.array of new decimal fee rates
+    :param cltv: int, new time lock delta
+    :return: np.array of bools, True if a channel's policy is unchanged
+    """
+    return (local_base_fee == new_bases) & \
+        (local_fee_rate == (new_rates * 1E6).astype(np.int64)) & \
+        (local_time_lock_delta == cltv)
 
 
 def set_fees_by_balancedness(
         node, base_unbalanced_msat, rate_unbalanced_decimal, base_balanced_msat, rate_balanced_decimal,
-        unbalancedness=0.90):
+        unbalancedness=0.90, dry=True):
     """
     Can be used to set fees differently for balanced and unbalanced channels.
-    TODO: refactor out lnd api calls into :class:`lib.node.LndNode`
+    Channels which already have the new policy are not updated. By default
+    the new policies are only logged, they are sent to lnd only if dry is
+    switched off.
 
     :param node: :class:`lib.node.LndNode` instance
     :param base_unbalanced_msat: int
@@ -20,39 +105,50 @@ def set_fees_by_balancedness(
     :param base_balanced_msat: int
     :param rate_balanced_decimal: float (e.g. 0.00001 = 0.001 %)
     :param unbalancedness: float between 0 ... 1 (0: very balanced, 1: very unbalanced)
+    :param dry: if set, the policies are not set (dry run)
+    :type dry: bool
     """
 
     channels = node.get_unbalanced_channels()
-    logger.info(f"-------- unbalanced channels (|ub| > {unbalancedness}) ---------")
-    channels.sort(key=lambda x: abs(x['unbalancedness']), reverse=True)
+    channels = ChannelColumns(sorted(
+        channels.values(),
+        key=lambda x: abs(x['unbalancedness']), reverse=True),
+        node.get_channel_fee_policies())
+
+    # classify all channels at once and determine their new policies
+    is_unbalanced, new_bases, new_rates = compute_policies_by_balancedness(
+        channels.ub, base_unbalanced_msat, rate_unbalanced_decimal,
+        base_balanced_msat, rate_balanced_decimal, unbalancedness)
+    unchanged = unchanged_policies(
+        channels.local_base_fee, channels.local_fee_rate,
+        channels.local_time_lock_delta, new_bases, new_rates, CLTV)
+
+    channel_fee_policies = {
+        channels.channel_point[i]: {
+            'base_fee_msat': int(new_bases[i]),
+            'fee_rate': float(new_rates[i]),
+            'cltv': CLTV,
+        } for i in np.flatnonzero(~unchanged)
+    }
+
+    # report the classification of all channels in a single log message
+    lines = [f"-------- unbalanced channels (|ub| > {unbalancedness}) ---------"]
     print_divide = 0
-
-    for c in channels:
-        logger.info(f"|ub|: {abs(c['unbalancedness']):1.4f} c: {c['chan_id']} a: {c['alias']}")
-
-        cp_parts = c['channel_point'].split(':')
-
-        channel_point = ln.ChannelPoint(funding_txid_str=cp_parts[0], output_index=int(cp_parts[1]))
-
-        if abs(c['unbalancedness']) > unbalancedness:  # unbalanced
-            new_base = base_unbalanced_msat
-            new_rate = rate_unbalanced_decimal
-        else:  # balanced
-            if print_divide == 0:
-                logger.info(f"-------- balanced channels (|ub| < {unbalancedness}) --------")
-                print_divide = 1
-
-            new_base = base_balanced_msat
-            new_rate = rate_balanced_decimal
-
-        update_request = ln.PolicyUpdateRequest(
-            chan_point=channel_point,
-            base_fee_msat=new_base,
-            fee_rate=new_rate,
-            time_lock_delta=CLTV,
-        )
-        logger.debug(update_request)
-        # node._stub.UpdateChannelPolicy(request=update_request)
+    for unbalanced, ub, chan_id, alias in zip(
+            is_unbalanced, channels.ub, channels.chan_id, channels.alias):
+        if not unbalanced and print_divide == 0:
+            lines.append(f"-------- balanced channels (|ub| < {unbalancedness}) --------")
+            print_divide = 1
+        lines.append(f"|ub|: {abs(ub):1.4f} c: {chan_id} a: {alias}")
+    logger.info("\n".join(lines))
+
+    logger.info(f"{len(channel_fee_policies)} channel policies to update, "
+                f"skipping {np.count_nonzero(unchanged)} unchanged ones.")
+    logger.debug(channel_fee_policies)
+    if dry:
+        logger.info("Dry run, no channel policies were set.")
+        return
+    node.set_channel_fee_policies(channel_fee_policies)
 
 
 if __name__ == '__main__':
@@ -1,5 +1,6 @@
 import logging
 from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
 
@@ -53,34 +54,42 @@ class ForwardingAnalyzer(object):
         :param time_start: time interval start, unix timestamp
         :param time_end: time interval end, unix timestamp
         """
+        channels = self.channels
+        total_forwarding_amount_sat = 0
+        total_forwarding_fees_msat = 0
+        forwardings = 0
+        cumulative_effective_fee = 0
+
         for f in self.forwarding_events:
             if time_start < f['timestamp'] < time_end:
                 # make a dictionary entry for unknown channels
                 channel_id_in = f['chan_id_in']
                 channel_id_out = f['chan_id_out']
 
-                if channel_id_in not in self.channels.keys():
-                    self.channels[channel_id_in] = ChannelStatistics(
-                        channel_id_in)
-                if channel_id_out not in self.channels.keys():
-                    self.channels[channel_id_out] = ChannelStatistics(
-                        channel_id_out)
-
-                self.channels[channel_id_in].inward_forwardings.append(
-                    f['amt_in'])
-                self.channels[channel_id_out].outward_forwardings.append(
-                    f['amt_out'])
-                self.channels[channel_id_out].absolute_fees.append(
-                    f['fee_msat'])
-                self.channels[channel_id_out].effective_fees.append(
-                    f['effective_fee'])
-                self.channels[channel_id_out].timestamps.append(
-                    f['timestamp'])
-
-                self.total_forwarding_amount_sat += f['amt_in']
-                self.total_forwarding_fees_msat += f['fee_msat']
-                self.forwardings += 1
-                self.cumulative_effective_fee += f['effective_fee']
+                channel_in = channels.get(channel_id_in)
+                if channel_in is None:
+                    channel_in = channels[channel_id_in] = \
+                        ChannelStatistics(channel_id_in)
+                channel_out = channels.get(channel_id_out)
+                if channel_out is None:
+                    channel_out = channels[channel_id_out] = \
+                        ChannelStatistics(channel_id_out)
+
+                channel_in.inward_forwardings.append(f['amt_in'])
+                channel_out.outward_forwardings.append(f['amt_out'])
+                channel_out.absolute_fees.append(f['fee_msat'])
+                channel_out.effective_fees.append(f['effective_fee'])
+                channel_out.timestamps.append(f['timestamp'])
+
+                total_forwarding_amount_sat += f['amt_in']
+                total_forwarding_fees_msat += f['fee_msat']
+                forwardings += 1
+                cumulative_effective_fee += f['effective_fee']
+
+        self.total_forwarding_amount_sat += total_forwarding_amount_sat
+        self.total_forwarding_fees_msat += total_forwarding_fees_msat
+        self.forwardings += forwardings
+        self.cumulative_effective_fee += cumulative_effective_fee
 
     def get_forwarding_statistics_channels(self):
         """
@@ -139,8 +148,12 @@ class ForwardingAnalyzer(object):
         :return:
         """
         channel_statistics = self.get_forwarding_statistics_channels()
-        closed_channels = self.node.get_closed_channels()
-        open_channels = self.node.get_open_channels()
+        # both are independent rpc calls, which are waited for concurrently
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            closed_channels = executor.submit(self.node.get_closed_channels)
+            open_channels = executor.submit(self.node.get_open_channels)
+            closed_channels = closed_channels.result()
+            open_channels = open_channels.result()
         logger.debug(f"Number of channels with known forwardings: "
                      f"{len(closed_channels) + len(open_channels)} "
                      f"(thereof {len(closed_channels)} closed channels).")
@@ -298,8 +311,8 @@ class ForwardingAnalyzer(object):
                 if (f['amt_out_msat'] % 1000):
                     meaningful_outward_forwardings += 1
                     logger.debug(
-                        f"Forwarding was not last hop: {f['amt_out_msat']}, "
-                        f"chan_id_out: {chan_id_out}")
+                        "Forwarding was not last hop: %s, chan_id_out: %s",
+                        f['amt_out_msat'], chan_id_out)
                     for n, nv in normalized_outgoing.items():
                         total_outgoing_neighbors[n] += nv * weight
         logger.info(f"Could use {meaningful_outward_forwardings} "
@@ -393,10 +406,7 @@ class ForwardingAnalyzer(object):
 
         for n in neighbors:
             if n not in excluded_nodes:
-                if n in node_weights.keys():
-                    node_weights[n] = min(node_weights[n] + weight, 1.0)
-                else:
-                    node_weights[n] = weight
+                node_weights[n] = min(node_weights.get(n, 0.0) + weight, 1.0)
 
         return node_weights
 
@@ -415,11 +425,8 @@ class ForwardingAnalyzer(object):
 
         # add all the nodes from the second dict
         for n, v in second_neighbor_dict.items():
-            if n in joined_neighbor_dict:
-                joined_neighbor_dict[n] = min(
-                    1, joined_neighbor_dict[n] + second_neighbor_dict[n])
-            else:
-                joined_neighbor_dict[n] = second_neighbor_dict[n]
+            joined_neighbor_dict[n] = min(
+                1, joined_neighbor_dict.get(n, 0.0) + v)
 
         return joined_neighbor_dict
 
@@ -542,7 +549,15 @@ def get_forwarding_statistics_channels(node, time_interval_start,
     :param time_interval_end: unix timestamp
     :return: dict of channel information with channel_id as keys
     """
-    forwarding_analyzer = ForwardingAnalyzer(node)
+    # fetching the forwardings and the channels are independent rpc calls,
+    # which are waited for concurrently
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        forwarding_analyzer = executor.submit(ForwardingAnalyzer, node)
+        channels = executor.submit(
+            node.get_unbalanced_channels, unbalancedness_greater_than=0.0)
+        forwarding_analyzer = forwarding_analyzer.result()
+        channels = channels.result()
+
     forwarding_analyzer.initialize_forwarding_data(
         time_interval_start, time_interval_end)
 
@@ -550,9 +565,14 @@ def get_forwarding_statistics_channels(node, time_interval_start,
     statistics = forwarding_analyzer.get_forwarding_statistics_channels()
     logger.debug(f"Time interval (between first and last forwarding) is "
                  f"{forwarding_analyzer.max_time_interval:6.2f} days.")
-    # join the two data sets:
-    channels = node.get_unbalanced_channels(unbalancedness_greater_than=0.0)
 
+    # time interval may be zero, to avoid zero division, replace by NaN
+    try:
+        weeks_per_time_interval = 7 / forwarding_analyzer.max_time_interval
+    except ZeroDivisionError:
+        weeks_per_time_interval = float('nan')
+
+    # join the two data sets:
     # TODO: improve this code, don't repeat
     for k, c in channels.items():
         try:  # channel forwarding statistics exists
@@ -562,12 +582,8 @@ def get_forwarding_statistics_channels(node, time_interval_start,
                 nan_to_zero(chan_stats['mean_forwarding_out'])
             ) / c['capacity']
             c['fees_total'] = chan_stats['fees_total']
-            # time interval may be zero, to avoid zero division, replace by NaN
-            try:
-                c['fees_total_per_week'] = chan_stats['fees_total'] \
-                    / (forwarding_analyzer.max_time_interval / 7)
-            except ZeroDivisionError:
-                c['fees_total_per_week'] = float('nan')
+            c['fees_total_per_week'] = \
+                chan_stats['fees_total'] * weeks_per_time_interval
             c['flow_direction'] = chan_stats['flow_direction']
             c['median_forwarding_in'] = chan_stats['median_forwarding_in']
             c['median_forwarding_out'] = chan_stats['median_forwarding_out']
@@ -57,6 +57,19 @@ class Network(object):
             with open(cache_edges_filename, 'rb') as file:
                 self.edges = pickle.load(file)
 
+    @staticmethod
+    def invalidate_cache():
+        """
+        Removes the cached graph, such that it is fetched from lnd on the
+        next initialization, e.g. after our own channel policies changed.
+        """
+        cache_dir = os.path.join(settings.home_dir, 'cache')
+        for filename in ['graph.gpickle', 'edges.gpickle']:
+            try:
+                os.remove(os.path.join(cache_dir, filename))
+            except FileNotFoundError:
+                pass
+
     def set_graph_and_edges(self):
         """
         Reads in the networkx graph and edges dictionary.
@@ -2,6 +2,7 @@ import os
 import codecs
 import time
 import datetime
+import pickle
 from collections import OrderedDict
 
 import grpc
@@ -15,7 +16,11 @@ import lndmanage.grpc_compiled.router_pb2 as lndrouter
 import lndmanage.grpc_compiled.router_pb2_grpc as lndrouterrpc
 
 from lndmanage.lib.network import Network
-from lndmanage.lib.exceptions import PaymentTimeOut, NoRoute
+from lndmanage.lib.exceptions import (
+    PaymentTimeOut,
+    NoRoute,
+    PolicyUpdateError
+)
 from lndmanage.lib.utilities import convert_dictionary_number_strings_to_ints
 from lndmanage.lib.ln_utilities import (
     extract_short_channel_id_from_string,
@@ -30,6 +35,12 @@ logger = logging.getLogger(__name__)
 logger.addHandler(logging.NullHandler())
 
 NUM_MAX_FORWARDING_EVENTS = 100000
+SECONDS_PER_DAY = 24 * 60 * 60
+# days are only cached after this margin has passed since their end, as lnd
+# persists forwarding events in batches and its clock may differ from ours
+FORWARDINGS_CACHING_MARGIN_SECONDS = 60 * 60
+# number of channel policy updates lnd has to process at the same time
+MAX_POLICY_UPDATES_IN_FLIGHT = 10
 
 
 class Node(object):
@@ -148,7 +159,8 @@ class LndNode(Node):
 
         # necessary to circumvent standard size limitation
         channel = grpc.secure_channel(lnd_host, creds, options=[
-            ('grpc.max_receive_message_length', 50 * 1024 * 1024)
+            ('grpc.max_receive_message_length', 50 * 1024 * 1024),
+            ('grpc.max_send_message_length', 50 * 1024 * 1024),
         ])
 
         # establish connections to rpc servers
@@ -328,6 +340,11 @@ class LndNode(Node):
         channels_data = raw_channels.ListFields()[0][1]
         channels = OrderedDict()
 
+        now = time.time()
+
+        def convert_to_days_ago(timestamp):
+            return (now - timestamp) / SECONDS_PER_DAY
+
         for c in channels_data:
             # calculate age from blockheight
             blockheight, _, _ = convert_channel_id_to_short_channel_id(
@@ -353,11 +370,10 @@ class LndNode(Node):
                 policy_peer = {'fee_base_msat': float(-999),
                           'fee_rate_milli_msat': float(999)}
                 policy_local = {'fee_base_msat': float(-999),
-                               'fee_rate_milli_msat': float(999)}
+                               'fee_rate_milli_msat': float(999),
+                               'time_lock_delta': float(-999)}
 
             # calculate last update (days ago)
-            def convert_to_days_ago(timestamp):
-                return (time.time() - timestamp) / (60 * 60 * 24)
             try:
                 last_update = convert_to_days_ago(
                     self.network.edges[c.chan_id]['last_update'])
@@ -394,6 +410,7 @@ class LndNode(Node):
                 'peer_fee_rate': policy_peer['fee_rate_milli_msat'],
                 'local_base_fee': policy_local['fee_base_msat'],
                 'local_fee_rate': policy_local['fee_rate_milli_msat'],
+                'local_time_lock_delta': policy_local['time_lock_delta'],
                 'initiator': c.initiator,
                 'last_update': last_update,
                 'last_update_local': last_update_local,
@@ -449,6 +466,105 @@ class LndNode(Node):
         }
         return unbalanced_channels
 
+    def get_channel_fee_policies(self):
+        """
+        Fetches the current fee policies of this node's channels directly
+        from lnd, which are up to date in contrast to the cached graph.
+
+        :return: dict with channel points as keys, values are dicts with
+            keys 'base_fee_msat', 'fee_per_mil'
+        :rtype: dict
+        """
+        fee_report = self._rpc.FeeReport(lnd.FeeReportRequest())
+        return {
+            f.chan_point: {
+                'base_fee_msat': f.base_fee_msat,
+                'fee_per_mil': f.fee_per_mil,
+            } for f in fee_report.channel_fees
+        }
+
+    def set_channel_fee_policies(self, channel_fee_policies):
+        """
+        Sets the fee policies of several channels.
+
+        If all open channels are to be set to the same policy, a single
+        global update request is sent. Otherwise the per-channel requests
+        are issued in chunks of MAX_POLICY_UPDATES_IN_FLIGHT, where the
+        requests of a chunk don't wait for each other, such that only one
+        round trip per chunk has to be waited for.
+        The cached graph is invalidated, as it contains our old policies.
+
+        :param channel_fee_policies: policies with channel points as keys,
+            values are dicts with keys 'base_fee_msat', 'fee_rate', 'cltv'
+        :type channel_fee_policies: dict
+
+        :raises PolicyUpdateError: if the policy of any channel could not
+            be set, after all requests were collected
+        """
+        if not channel_fee_policies:
+            return
+
+        policies = set(
+            (p['base_fee_msat'], p['fee_rate'], p['cltv'])
+            for p in channel_fee_policies.values())
+        open_channel_points = set(
+            c['channel_point'] for c in self.get_all_channels().values())
+
+        if len(policies) == 1 and \
+                open_channel_points.issubset(channel_fee_policies.keys()):
+            base_fee_msat, fee_rate, cltv = policies.pop()
+            logger.debug("Setting global fee policy.")
+            try:
+                self._rpc.UpdateChannelPolicy(lnd.PolicyUpdateRequest(
+                    base_fee_msat=base_fee_msat,
+                    fee_rate=fee_rate,
+                    time_lock_delta=cltv,
+                    **{'global': True}
+                ))
+            except grpc.RpcError as e:
+                logger.error("Could not set global fee policy: %s", e)
+                raise PolicyUpdateError(
+                    f"Setting global fee policy failed: {e}")
+            finally:
+                Network.invalidate_cache()
+            return
+
+        channel_points = list(channel_fee_policies.keys())
+        failed_channel_points = []
+        for i in range(0, len(channel_points), MAX_POLICY_UPDATES_IN_FLIGHT):
+            futures = {}
+            for channel_point in \
+                    channel_points[i:i + MAX_POLICY_UPDATES_IN_FLIGHT]:
+                policy = channel_fee_policies[channel_point]
+                funding_txid, output_index = channel_point.split(':')
+                request = lnd.PolicyUpdateRequest(
+                    chan_point=lnd.ChannelPoint(
+                        funding_txid_str=funding_txid,
+                        output_index=int(output_index)),
+                    base_fee_msat=policy['base_fee_msat'],
+                    fee_rate=policy['fee_rate'],
+                    time_lock_delta=policy['cltv'],
+                )
+                logger.debug(request)
+                futures[channel_point] = \
+                    self._rpc.UpdateChannelPolicy.future(request)
+
+            for channel_point, future in futures.items():
+                try:
+                    future.result()
+                except grpc.RpcError as e:
+                    logger.error(
+                        "Could not set fee policy of channel %s: %s",
+                        channel_point, e)
+                    failed_channel_points.append(channel_point)
+        Network.invalidate_cache()
+
+        if failed_channel_points:
+            raise PolicyUpdateError(
+                f"Setting fee policies failed for "
+                f"{len(failed_channel_points)} of {len(channel_points)} "
+                f"channels: {', '.join(failed_channel_points)}")
+
     @staticmethod
     def timestamp_from_now(offset_days=0):
         """
@@ -466,15 +582,94 @@ class LndNode(Node):
         """
         Fetches all forwarding events between now and offset_days ago.
 
+        Forwarding events of completed days (UTC) don't change anymore and
+        are cached in daily buckets in the lndmanage cache folder, such that
+        only the days missing in the cache are fetched from lnd. A day only
+        counts as completed once FORWARDINGS_CACHING_MARGIN_SECONDS have
+        passed since its end.
+
         :param offset_days: int
         :return: lnd fowarding events
         """
         now = self.timestamp_from_now()
         then = self.timestamp_from_now(offset_days)
 
+        if not settings.CACHING_FORWARDINGS:
+            return self._fetch_forwarding_events(then, now)
+
+        cache_dir = os.path.join(settings.home_dir, 'cache')
+        if not os.path.exists(cache_dir):
+            os.mkdir(cache_dir)
+        bucket_prefix = f'fwd-{self.pub_key[:16]}-'
+
+        def bucket_date(day):
+            return time.strftime('%Y%m%d', time.gmtime(day * SECONDS_PER_DAY))
+
+        def bucket_filename(day):
+            return os.path.join(
+                cache_dir, f'{bucket_prefix}{bucket_date(day)}.pickle')
+
+        first_day = then // SECONDS_PER_DAY
+        today = now // SECONDS_PER_DAY
+        # days before this one are considered to be complete
+        complete_day = \
+            (now - FORWARDINGS_CACHING_MARGIN_SECONDS) // SECONDS_PER_DAY
+
+        # read cached days until the first day missing in the cache,
+        # unreadable buckets (e.g. from an interrupted run) count as missing
+        events = []
+        day = first_day
+        while day < complete_day:
+            try:
+                with open(bucket_filename(day), 'rb') as file:
+                    events.extend(pickle.load(file))
+            except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+                break
+            day += 1
+
+        # fetch the remaining days at once and cache the completed ones
+        fetched_events = self._fetch_forwarding_events(
+            day * SECONDS_PER_DAY, now)
+        # a truncated result would leave incomplete buckets behind
+        if len(fetched_events) >= NUM_MAX_FORWARDING_EVENTS:
+            buckets = {}
+        else:
+            buckets = {d: [] for d in range(day, complete_day)}
+        for e in fetched_events:
+            bucket = buckets.get(e['timestamp'] // SECONDS_PER_DAY)
+            if bucket is not None:
+                bucket.append(e)
+        for d, bucket in buckets.items():
+            # write to a temporary file first to never leave a partial bucket
+            filename = bucket_filename(d)
+            with open(filename + '.tmp', 'wb') as file:
+                pickle.dump(bucket, file)
+            os.replace(filename + '.tmp', filename)
+        events.extend(fetched_events)
+
+        # remove buckets which are older than any time window in use
+        oldest_date = bucket_date(min(
+            first_day,
+            today - settings.CACHING_FORWARDINGS_RETENTION_DAYS))
+        for filename in os.listdir(cache_dir):
+            if filename.startswith(bucket_prefix) and \
+                    filename.endswith('.pickle') and \
+                    filename[len(bucket_prefix):-len('.pickle')] < oldest_date:
+                os.remove(os.path.join(cache_dir, filename))
+
+        return [e for e in events if e['timestamp'] >= then]
+
+    def _fetch_forwarding_events(self, time_start, time_end):
+        """
+        Fetches all forwarding events between two timestamps from lnd.
+
+        :param time_start: unix timestamp
+        :param time_end: unix timestamp
+        :return: lnd fowarding events
+        """
         forwardings = self._rpc.ForwardingHistory(lnd.ForwardingHistoryRequest(
-            start_time=then,
-            end_time=now,
+            start_time=time_start,
+            end_time=time_end,
             num_max_events=NUM_MAX_FORWARDING_EVENTS))
 
         events = [{
@@ -581,8 +776,8 @@ class LndNode(Node):
         else:
             ignored_channels_api = []
 
-        logger.debug(f"Ignored for queryroutes: channels: "
-                     f"{ignored_channels_api}, nodes: {ignored_nodes_api}")
+        logger.debug("Ignored for queryroutes: channels: %s, nodes: %s",
+                     ignored_channels_api, ignored_nodes_api)
 
         request = lnd.QueryRoutesRequest(
             pub_key=target_pubkey,
@@ -25,7 +25,7 @@ def ksp_discard_high_cost_paths(graph, source, target, num_k, weight):
     logger.debug("Approximate costs [msat] of routes:")
     for r, rc in zip(routes, route_costs):
         if rc < settings.PENALTY:
-            logger.debug(f"  {rc} msat: {r}")
+            logger.debug("  %s msat: %s", rc, r)
             final_routes.append(r)
     return final_routes
 
@@ -59,7 +59,7 @@ class ChannelRater(object):
             'source': source,
             'target': target,
         }
-        logger.debug(f"bad channels so far: {self.get_bad_channels()}")
+        logger.debug("bad channels so far: %s", self.get_bad_channels())
 
     def add_bad_node(self, node_pub_key):
         """
@@ -68,7 +68,7 @@ class ChannelRater(object):
         :param node_pub_key: str
         """
         self.bad_nodes.append(node_pub_key)
-        logger.debug(f"bad nodes so far: {self.bad_nodes}")
+        logger.debug("bad nodes so far: %s", self.bad_nodes)
 
     def get_bad_channels(self):
         return self.bad_channels.keys()
@@ -58,18 +58,18 @@ class Route(object):
 
             self._node_hops.append(node_left)
 
-            logger.debug(f"Route from {node_left}")
-            logger.debug(f"        to {node_right}")
-            logger.debug(f"Policy of forwarding node: {policy}")
+            logger.debug("Route from %s", node_left)
+            logger.debug("        to %s", node_right)
+            logger.debug("Policy of forwarding node: %s", policy)
 
             fees_msat = policy['fee_base_msat'] + policy['fee_rate_milli_msat'] * forward_msat // 1000000
             forward_msat = amt_msat + sum(fees_msat_container[:ichannel])
             fees_msat_container.append(fees_msat)
 
-            logger.debug(f"Hop: {len(channel_hops) - ichannel}")
-            logger.debug(f"     Fees: {fees_msat}")
-            logger.debug(f"     Fees container {fees_msat_container}")
-            logger.debug(f"     Forward: {forward_msat}")
+            logger.debug("Hop: %d", len(channel_hops) - ichannel)
+            logger.debug("     Fees: %s", fees_msat)
+            logger.debug("     Fees container %s", fees_msat_container)
+            logger.debug("     Forward: %s", forward_msat)
 
             self._hops.append({
                 'chan_id': channel_data['channel_id'],
@@ -6,6 +6,10 @@ from pathlib import Path
 # -------- graph settings --------
 # accepted age of the network graph
 CACHING_RETENTION_MINUTES = 30
+# forwarding events of completed days are cached
+CACHING_FORWARDINGS = True
+# cached forwarding events older than this are removed
+CACHING_FORWARDINGS_RETENTION_DAYS = 365
 
 # -------- pathfinding --------
 # default penalty for non-active channels / too small channels / unbalanced channels
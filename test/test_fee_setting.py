@@ -0,0 +1,36 @@
+from unittest import TestCase
+
+import numpy as np
+
+from lndmanage.lib.fee_setting import (
+    compute_policies_by_balancedness,
+    unchanged_policies
+)
+
+
+class FeeSettingTest(TestCase):
+    def test_policies_by_balancedness(self):
+        ub = np.array([-0.95, -0.5, 0.0, 0.9, 0.99])
+        is_unbalanced, bases, rates = compute_policies_by_balancedness(
+            ub, base_unbalanced_msat=0, rate_unbalanced_decimal=0.000001,
+            base_balanced_msat=40, rate_balanced_decimal=0.00005,
+            unbalancedness=0.9)
+        self.assertListEqual(
+            list(is_unbalanced), [True, False, False, False, True])
+        self.assertListEqual(list(bases), [0, 40, 40, 40, 0])
+        np.testing.assert_allclose(
+            rates, [0.000001, 0.00005, 0.00005, 0.00005, 0.000001])
+
+    def test_unchanged_policies(self):
+        unchanged = unchanged_policies(
+            local_base_fee=np.array([40, 40, 40, -999., 40, 0]),
+            local_fee_rate=np.array([50, 50, 49, 999., 1, 1]),
+            local_time_lock_delta=np.array([40, 144, 40, -999., 40, 40]),
+            new_bases=np.array([40, 40, 40, 40, 40, 1]),
+            new_rates=np.array(
+                [0.00005, 0.00005, 0.00005, 0.00005, 0.0000015, 0.000001]),
+            cltv=40)
+        # equal, cltv mismatch, rate mismatch, unknown policy placeholder,
+        # rate with fractional ppm is truncated by lnd, base mismatch
+        self.assertListEqual(
+            list(unchanged), [True, False, False, False, True, False])
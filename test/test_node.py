@@ -0,0 +1,305 @@
+import os
+import shutil
+import tempfile
+import time
+from unittest import TestCase, mock
+
+import grpc
+
+from lndmanage import settings
+from lndmanage.lib.exceptions import PolicyUpdateError
+from lndmanage.lib.node import (
+    LndNode,
+    SECONDS_PER_DAY,
+    FORWARDINGS_CACHING_MARGIN_SECONDS
+)
+import lndmanage.grpc_compiled.rpc_pb2 as lnd
+
+
+class FakeFuture(object):
+    def __init__(self, update_channel_policy, fails):
+        self.update_channel_policy = update_channel_policy
+        self.fails = fails
+
+    def result(self):
+        self.update_channel_policy.in_flight -= 1
+        if self.fails:
+            raise grpc.RpcError()
+
+
+class FakeUpdateChannelPolicy(object):
+    """Records policy update requests instead of sending them to lnd."""
+    def __init__(self, failing_txids=()):
+        self.failing_txids = failing_txids
+        self.fail_global = False
+        self.requests = []
+        self.future_requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def __call__(self, request):
+        self.requests.append(request)
+        if self.fail_global:
+            raise grpc.RpcError()
+
+    def future(self, request):
+        self.future_requests.append(request)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        return FakeFuture(
+            self, request.chan_point.funding_txid_str in self.failing_txids)
+
+
+class FakeRpc(object):
+    def __init__(self, failing_txids=()):
+        self.UpdateChannelPolicy = FakeUpdateChannelPolicy(failing_txids)
+
+    @staticmethod
+    def FeeReport(request):
+        return lnd.FeeReportResponse(channel_fees=[
+            lnd.ChannelFeeReport(
+                chan_point='a:0', base_fee_msat=1000, fee_per_mil=1),
+            lnd.ChannelFeeReport(
+                chan_point='b:1', base_fee_msat=0, fee_per_mil=50),
+        ])
+
+
+class PolicyNode(LndNode):
+    """Node without connection to lnd with a fixed set of channels."""
+    def __init__(self, channel_points, failing_txids=()):
+        self.channel_points = channel_points
+        self._rpc = FakeRpc(failing_txids)
+
+    def get_all_channels(self):
+        return {i: {'channel_point': cp}
+                for i, cp in enumerate(self.channel_points)}
+
+
+def policy(base_fee_msat=1, fee_rate=0.000001, cltv=40):
+    return {'base_fee_msat': base_fee_msat, 'fee_rate': fee_rate,
+            'cltv': cltv}
+
+
+class ChannelFeePoliciesTest(TestCase):
+    def setUp(self):
+        self.home_dir = settings.home_dir
+        settings.home_dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(settings.home_dir, 'cache')
+
+    def tearDown(self):
+        shutil.rmtree(settings.home_dir)
+        settings.home_dir = self.home_dir
+
+    def test_get_channel_fee_policies(self):
+        node = PolicyNode(['a:0', 'b:1'])
+        self.assertDictEqual(node.get_channel_fee_policies(), {
+            'a:0': {'base_fee_msat': 1000, 'fee_per_mil': 1},
+            'b:1': {'base_fee_msat': 0, 'fee_per_mil': 50},
+        })
+
+    def test_graph_cache_is_invalidated(self):
+        os.mkdir(self.cache_dir)
+        for filename in ['graph.gpickle', 'edges.gpickle']:
+            open(os.path.join(self.cache_dir, filename), 'wb').close()
+        node = PolicyNode(['a:0', 'b:1'])
+        node.set_channel_fee_policies(
+            {'a:0': policy(), 'b:1': policy(base_fee_msat=2)})
+        self.assertListEqual(os.listdir(self.cache_dir), [])
+
+    def test_no_policies(self):
+        node = PolicyNode(['a:0'])
+        node.set_channel_fee_policies({})
+        self.assertListEqual(node._rpc.UpdateChannelPolicy.requests, [])
+        self.assertListEqual(
+            node._rpc.UpdateChannelPolicy.future_requests, [])
+
+    def test_global_policy(self):
+        node = PolicyNode(['a:0', 'b:1'])
+        node.set_channel_fee_policies({'a:0': policy(), 'b:1': policy()})
+        requests = node._rpc.UpdateChannelPolicy.requests
+        self.assertEqual(len(requests), 1)
+        self.assertTrue(getattr(requests[0], 'global'))
+        self.assertEqual(requests[0].base_fee_msat, 1)
+        self.assertEqual(requests[0].time_lock_delta, 40)
+        self.assertListEqual(
+            node._rpc.UpdateChannelPolicy.future_requests, [])
+
+    def test_per_channel_policies_for_subset(self):
+        node = PolicyNode(['a:0', 'b:1', 'c:2'])
+        node.set_channel_fee_policies({'a:0': policy(), 'b:1': policy()})
+        self.assertListEqual(node._rpc.UpdateChannelPolicy.requests, [])
+        requests = node._rpc.UpdateChannelPolicy.future_requests
+        self.assertListEqual(
+            [(r.chan_point.funding_txid_str, r.chan_point.output_index)
+             for r in requests], [('a', 0), ('b', 1)])
+
+    def test_per_channel_policies_for_differing_policies(self):
+        node = PolicyNode(['a:0', 'b:1'])
+        node.set_channel_fee_policies(
+            {'a:0': policy(), 'b:1': policy(base_fee_msat=2)})
+        self.assertListEqual(node._rpc.UpdateChannelPolicy.requests, [])
+        requests = node._rpc.UpdateChannelPolicy.future_requests
+        self.assertListEqual(
+            [r.base_fee_msat for r in requests], [1, 2])
+
+    def test_failed_updates_are_collected(self):
+        node = PolicyNode(['a:0', 'b:1', 'c:2', 'd:3'], failing_txids=('a', 'c'))
+        with self.assertRaises(PolicyUpdateError) as context:
+            node.set_channel_fee_policies({
+                'a:0': policy(), 'b:1': policy(), 'c:2': policy()})
+        # all requests are sent, although the first one fails
+        self.assertEqual(
+            len(node._rpc.UpdateChannelPolicy.future_requests), 3)
+        self.assertIn('a:0', str(context.exception))
+        self.assertIn('c:2', str(context.exception))
+        self.assertNotIn('b:1', str(context.exception))
+
+    def test_failed_global_update(self):
+        node = PolicyNode(['a:0', 'b:1'])
+        node._rpc.UpdateChannelPolicy.fail_global = True
+        with self.assertRaises(PolicyUpdateError):
+            node.set_channel_fee_policies({'a:0': policy(), 'b:1': policy()})
+        self.assertEqual(len(node._rpc.UpdateChannelPolicy.requests), 1)
+
+    def test_updates_in_flight_are_limited(self):
+        channel_points = [f'{txid}:0' for txid in 'abcde']
+        node = PolicyNode(channel_points + ['f:0'], failing_txids=('e',))
+        with mock.patch('lndmanage.lib.node.MAX_POLICY_UPDATES_IN_FLIGHT', 2):
+            with self.assertRaises(PolicyUpdateError) as context:
+                node.set_channel_fee_policies(
+                    {cp: policy() for cp in channel_points})
+        self.assertEqual(node._rpc.UpdateChannelPolicy.max_in_flight, 2)
+        self.assertEqual(
+            len(node._rpc.UpdateChannelPolicy.future_requests), 5)
+        self.assertIn('1 of 5', str(context.exception))
+
+
+class ForwardingNode(LndNode):
+    """Node without connection to lnd with a fixed forwarding history."""
+    def __init__(self, events):
+        self.pub_key = '02' + 'ab' * 32
+        self.events = events
+        self.fetches = []
+
+    def _fetch_forwarding_events(self, time_start, time_end):
+        self.fetches.append((time_start, time_end))
+        return [e for e in self.events
+                if time_start <= e['timestamp'] <= time_end]
+
+
+class ForwardingEventsCacheTest(TestCase):
+    def setUp(self):
+        self.home_dir = settings.home_dir
+        self.caching_forwardings = settings.CACHING_FORWARDINGS
+        settings.home_dir = tempfile.mkdtemp()
+        settings.CACHING_FORWARDINGS = True
+        self.cache_dir = os.path.join(settings.home_dir, 'cache')
+
+        now = LndNode.timestamp_from_now()
+        self.complete_day = \
+            (now - FORWARDINGS_CACHING_MARGIN_SECONDS) // SECONDS_PER_DAY
+        # spaced such that no event falls onto a window boundary
+        events = [{'timestamp': now - n * 7 * 3600 - 1800}
+                  for n in range(200)]
+        self.node = ForwardingNode(events)
+
+    def tearDown(self):
+        shutil.rmtree(settings.home_dir)
+        settings.home_dir = self.home_dir
+        settings.CACHING_FORWARDINGS = self.caching_forwardings
+
+    def expected_timestamps(self, offset_days):
+        then = LndNode.timestamp_from_now(offset_days)
+        return sorted(e['timestamp'] for e in self.node.events
+                      if e['timestamp'] >= then)
+
+    def timestamps(self, offset_days):
+        return sorted(e['timestamp'] for e in
+                      self.node.get_forwarding_events(offset_days))
+
+    def bucket_filenames(self):
+        return [f for f in os.listdir(self.cache_dir)
+                if f.endswith('.pickle')]
+
+    def bucket_path_of(self, day):
+        date = time.strftime('%Y%m%d', time.gmtime(day * SECONDS_PER_DAY))
+        return os.path.join(
+            self.cache_dir, f'fwd-{self.node.pub_key[:16]}-{date}.pickle')
+
+    def first_day(self, offset_days):
+        return LndNode.timestamp_from_now(offset_days) // SECONDS_PER_DAY
+
+    def test_cache_hits(self):
+        self.assertListEqual(self.timestamps(30), self.expected_timestamps(30))
+        self.assertEqual(self.node.fetches[0][0],
+                         self.first_day(30) * SECONDS_PER_DAY)
+        self.assertEqual(len(self.bucket_filenames()),
+                         self.complete_day - self.first_day(30))
+        self.assertListEqual(
+            [f for f in os.listdir(self.cache_dir) if f.endswith('.tmp')], [])
+
+        # only the days which are not complete yet are fetched again
+        self.assertListEqual(self.timestamps(30), self.expected_timestamps(30))
+        self.assertEqual(self.node.fetches[1][0],
+                         self.complete_day * SECONDS_PER_DAY)
+
+    def test_cached_events_are_filtered_by_time_window(self):
+        self.timestamps(30)
+        self.assertListEqual(self.timestamps(3), self.expected_timestamps(3))
+
+    def test_gap_in_cache(self):
+        self.timestamps(30)
+        gap_day = self.first_day(30) + 5
+        os.remove(self.bucket_path_of(gap_day))
+
+        self.assertListEqual(self.timestamps(30), self.expected_timestamps(30))
+        self.assertEqual(self.node.fetches[1][0], gap_day * SECONDS_PER_DAY)
+
+    def test_truncated_bucket_counts_as_missing(self):
+        self.timestamps(30)
+        broken_day = self.first_day(30) + 5
+        with open(self.bucket_path_of(broken_day), 'wb') as file:
+            file.write(b'\x80\x04\x95')
+
+        self.assertListEqual(self.timestamps(30), self.expected_timestamps(30))
+        self.assertEqual(self.node.fetches[1][0], broken_day * SECONDS_PER_DAY)
+        # the bucket was rewritten
+        self.assertListEqual(self.timestamps(30), self.expected_timestamps(30))
+        self.assertEqual(
+            self.node.fetches[2][0], self.complete_day * SECONDS_PER_DAY)
+
+    def test_previous_day_is_not_cached_right_after_midnight(self):
+        midnight = self.complete_day * SECONDS_PER_DAY
+
+        def timestamp_from_now(offset_days=0):
+            return midnight + 5 - offset_days * SECONDS_PER_DAY
+
+        with mock.patch.object(
+                LndNode, 'timestamp_from_now', staticmethod(timestamp_from_now)):
+            self.node.get_forwarding_events(30)
+            self.assertFalse(
+                os.path.exists(self.bucket_path_of(self.complete_day - 1)))
+            self.assertTrue(
+                os.path.exists(self.bucket_path_of(self.complete_day - 2)))
+
+            # the previous day is fetched again on the next run
+            self.node.get_forwarding_events(30)
+            self.assertEqual(self.node.fetches[1][0],
+                             (self.complete_day - 1) * SECONDS_PER_DAY)
+
+    def test_truncated_result_is_not_cached(self):
+        with mock.patch('lndmanage.lib.node.NUM_MAX_FORWARDING_EVENTS', 10):
+            self.assertListEqual(
+                self.timestamps(30), self.expected_timestamps(30))
+        self.assertListEqual(self.bucket_filenames(), [])
+
+    def test_old_buckets_are_removed(self):
+        os.mkdir(self.cache_dir)
+        old_bucket = f'fwd-{self.node.pub_key[:16]}-20000101.pickle'
+        other_node_bucket = 'fwd-03cdcdcdcdcdcdcd-20000101.pickle'
+        for filename in [old_bucket, other_node_bucket]:
+            open(os.path.join(self.cache_dir, filename), 'wb').close()
+
+        self.timestamps(30)
+        self.assertNotIn(old_bucket, self.bucket_filenames())
+        self.assertIn(other_node_bucket, self.bucket_filenames())
@@ -2,6 +2,7 @@ import os
 from lndmanage import settings
 
 settings.CACHING_RETENTION_MINUTES = 0
+settings.CACHING_FORWARDINGS = False
 
 # constants for testing
 SLEEP_SEC_AFTER_REBALANCING = 2